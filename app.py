@@ -7,15 +7,15 @@
 """
 
 import streamlit as st
+import io
 import os
 from dotenv import load_dotenv
-import pandas as pd
 from datetime import datetime
 
 # 유틸리티 모듈 임포트
 from utils.text_processor import TextProcessor
 from utils.image_processor import ImageProcessor
-from utils.email_sender import EmailSender
+from utils.email_sender import get_email_sender
 
 # 환경 변수 로드
 load_dotenv()
@@ -71,6 +71,25 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+def read_text_file(uploaded_file) -> str:
+    """
+    업로드된 텍스트 파일을 UTF-8로 읽습니다.
+    
+    바이트 전체를 읽은 뒤 다시 디코딩하지 않고 파일을 읽으면서 바로 디코딩합니다.
+    
+    Args:
+        uploaded_file: Streamlit에서 업로드된 파일 객체
+        
+    Returns:
+        str: 파일 내용
+    """
+    text_stream = io.TextIOWrapper(uploaded_file, encoding="utf-8", errors="replace")
+    try:
+        return text_stream.read()
+    finally:
+        # 래퍼가 정리될 때 업로드된 파일까지 닫히지 않도록 분리
+        text_stream.detach()
+
 def main():
     """메인 애플리케이션 함수"""
     
@@ -114,11 +133,20 @@ def main():
             st.success("✅ Google API 키가 설정되었습니다.")
         
         # 이메일 설정 확인
-        email_sender = EmailSender()
+        email_sender = get_email_sender()
         if not email_sender.sender_email or not email_sender.sender_password:
             st.warning("⚠️ 이메일 전송 기능을 사용하려면 설정이 필요합니다.")
             with st.expander("이메일 설정 방법"):
                 st.text(email_sender.get_setup_instructions())
+        
+        # OCR 언어 설정 (언어를 하나만 고르면 인식 속도가 빨라짐)
+        st.selectbox(
+            "이미지 인식(OCR) 언어:",
+            ["kor", "eng", "kor+eng"],
+            format_func={"kor": "한국어", "eng": "영어", "kor+eng": "한국어 + 영어"}.get,
+            key="ocr_lang",
+            help="한 가지 언어만 선택하면 인식 속도가 빨라집니다. 영어가 많이 섞인 문서는 '한국어 + 영어'를 선택하세요."
+        )
     
     # API 키를 세션 상태에 저장
     st.session_state.api_key = api_key
@@ -140,7 +168,7 @@ def show_analysis_tab():
     
     st.header("🔍 수행평가 검사")
     
-    # 두 개의 컬럼으로 레이아웃 구성
+    # 입력 방법 선택 (선택에 따라 입력 위젯이 바뀌므로 폼 밖에 둠)
     col1, col2 = st.columns(2)
     
     with col1:
@@ -151,41 +179,6 @@ def show_analysis_tab():
             "요구조건 입력 방법을 선택하세요:",
             ["직접 입력", "이미지 업로드", "파일 업로드"]
         )
-        
-        requirements_text = ""
-        
-        if req_input_method == "직접 입력":
-            requirements_text = st.text_area(
-                "수행평가 요구조건을 입력하세요:",
-                height=300,
-                placeholder="예시:\n1. 최소 3페이지 이상 작성\n2. 참고문헌 5개 이상 포함\n3. 표와 그래프 각각 1개 이상 포함\n4. 결론 부분에서 개인적 견해 제시"
-            )
-        
-        elif req_input_method == "이미지 업로드":
-            uploaded_image = st.file_uploader(
-                "요구조건이 포함된 이미지를 업로드하세요:",
-                type=['png', 'jpg', 'jpeg', 'gif', 'bmp'],
-                key="req_image"
-            )
-            
-            if uploaded_image:
-                image_processor = ImageProcessor()
-                requirements_text = image_processor.extract_text_from_image(uploaded_image)
-                st.text_area("추출된 텍스트:", requirements_text, height=200)
-        
-        elif req_input_method == "파일 업로드":
-            uploaded_file = st.file_uploader(
-                "요구조건이 포함된 파일을 업로드하세요:",
-                type=['txt', 'docx', 'pdf'],
-                key="req_file"
-            )
-            
-            if uploaded_file:
-                if uploaded_file.type == "text/plain":
-                    requirements_text = str(uploaded_file.read(), "utf-8")
-                    st.text_area("파일 내용:", requirements_text, height=200)
-                else:
-                    st.warning("현재 txt 파일만 지원됩니다. 다른 형식은 추후 업데이트 예정입니다.")
     
     with col2:
         st.subheader("📄 결과물 입력")
@@ -195,88 +188,152 @@ def show_analysis_tab():
             "결과물 입력 방법을 선택하세요:",
             ["직접 입력", "이미지 업로드", "파일 업로드"]
         )
+    
+    # 입력 위젯들을 폼으로 묶어 글자를 입력할 때마다가 아닌 '검사 시작'을 누를 때만 다시 실행
+    with st.form("analysis"):
+        col1, col2 = st.columns(2)
         
-        submission_text = ""
-        
-        if sub_input_method == "직접 입력":
-            submission_text = st.text_area(
-                "수행평가 결과물을 입력하세요:",
-                height=300,
-                placeholder="여기에 수행평가 결과물을 입력하세요..."
-            )
-        
-        elif sub_input_method == "이미지 업로드":
-            uploaded_image = st.file_uploader(
-                "결과물이 포함된 이미지를 업로드하세요:",
-                type=['png', 'jpg', 'jpeg', 'gif', 'bmp'],
-                key="sub_image"
-            )
+        with col1:
+            requirements_text = ""
+            req_image = None
+            req_file = None
             
-            if uploaded_image:
-                image_processor = ImageProcessor()
-                submission_text = image_processor.extract_text_from_image(uploaded_image)
-                st.text_area("추출된 텍스트:", submission_text, height=200)
+            if req_input_method == "직접 입력":
+                requirements_text = st.text_area(
+                    "수행평가 요구조건을 입력하세요:",
+                    height=300,
+                    placeholder="예시:\n1. 최소 3페이지 이상 작성\n2. 참고문헌 5개 이상 포함\n3. 표와 그래프 각각 1개 이상 포함\n4. 결론 부분에서 개인적 견해 제시"
+                )
+            
+            elif req_input_method == "이미지 업로드":
+                req_image = st.file_uploader(
+                    "요구조건이 포함된 이미지를 업로드하세요:",
+                    type=['png', 'jpg', 'jpeg', 'gif', 'bmp'],
+                    key="req_image"
+                )
+            
+            elif req_input_method == "파일 업로드":
+                req_file = st.file_uploader(
+                    "요구조건이 포함된 파일을 업로드하세요:",
+                    type=['txt', 'docx', 'pdf'],
+                    key="req_file"
+                )
         
-        elif sub_input_method == "파일 업로드":
-            uploaded_file = st.file_uploader(
-                "결과물이 포함된 파일을 업로드하세요:",
-                type=['txt', 'docx', 'pdf'],
-                key="sub_file"
-            )
+        with col2:
+            submission_text = ""
+            sub_image = None
+            sub_file = None
             
-            if uploaded_file:
-                if uploaded_file.type == "text/plain":
-                    submission_text = str(uploaded_file.read(), "utf-8")
-                    st.text_area("파일 내용:", submission_text, height=200)
-                else:
-                    st.warning("현재 txt 파일만 지원됩니다. 다른 형식은 추후 업데이트 예정입니다.")
+            if sub_input_method == "직접 입력":
+                submission_text = st.text_area(
+                    "수행평가 결과물을 입력하세요:",
+                    height=300,
+                    placeholder="여기에 수행평가 결과물을 입력하세요..."
+                )
+            
+            elif sub_input_method == "이미지 업로드":
+                sub_image = st.file_uploader(
+                    "결과물이 포함된 이미지를 업로드하세요:",
+                    type=['png', 'jpg', 'jpeg', 'gif', 'bmp'],
+                    key="sub_image"
+                )
+            
+            elif sub_input_method == "파일 업로드":
+                sub_file = st.file_uploader(
+                    "결과물이 포함된 파일을 업로드하세요:",
+                    type=['txt', 'docx', 'pdf'],
+                    key="sub_file"
+                )
+        
+        # 검사 시작 버튼
+        st.markdown("---")
+        submitted = st.form_submit_button("🚀 검사 시작", type="primary", use_container_width=True)
+    
+    if not submitted:
+        return
     
-    # 검사 시작 버튼
-    st.markdown("---")
+    # 업로드된 파일 읽기
+    preview_col1, preview_col2 = st.columns(2)
     
-    if st.button("🚀 검사 시작", type="primary", use_container_width=True):
-        if not requirements_text.strip() or not submission_text.strip():
-            st.error("⚠️ 요구조건과 결과물을 모두 입력해주세요.")
-            return
+    if req_file:
+        with preview_col1:
+            if req_file.type == "text/plain":
+                requirements_text = read_text_file(req_file)
+                st.text_area("파일 내용:", requirements_text, height=200, key="req_file_preview")
+            else:
+                st.warning("현재 txt 파일만 지원됩니다. 다른 형식은 추후 업데이트 예정입니다.")
+    
+    if sub_file:
+        with preview_col2:
+            if sub_file.type == "text/plain":
+                submission_text = read_text_file(sub_file)
+                st.text_area("파일 내용:", submission_text, height=200, key="sub_file_preview")
+            else:
+                st.warning("현재 txt 파일만 지원됩니다. 다른 형식은 추후 업데이트 예정입니다.")
+    
+    # 업로드된 이미지들의 OCR을 동시에 수행
+    if req_image or sub_image:
+        image_processor = ImageProcessor()
+        # 요구조건은 짧은 단일 문단이므로 PSM 6, 결과물은 여러 단으로 구성될 수 있으므로 자동 레이아웃 분석(PSM 3)
+        images = [(image, psm) for image, psm in ((req_image, 6), (sub_image, 3)) if image]
+        extracted_texts = iter(image_processor.extract_texts_from_images(
+            *(image for image, _ in images),
+            lang=st.session_state.get('ocr_lang', 'kor'),
+            psms=[psm for _, psm in images]
+        ))
         
-        # 진행 상황 표시
-        with st.spinner("AI가 분석 중입니다..."):
-            try:
-                # 세션 상태에서 API 키 가져오기
-                current_api_key = st.session_state.get('api_key')
-                if not current_api_key:
-                    st.error("⚠️ API 키가 설정되지 않았습니다. 사이드바에서 API 키를 입력해주세요.")
-                    return
-                
-                # TextProcessor 초기화 (API 키 전달)
-                text_processor = TextProcessor(api_key=current_api_key)
-                
-                # 요구조건 추출
-                st.info("📋 요구조건을 분석하고 있습니다...")
-                requirements = text_processor.extract_requirements(requirements_text)
-                
-                if not requirements:
-                    st.error("요구조건을 추출할 수 없습니다. 텍스트를 다시 확인해주세요.")
-                    return
-                
-                # 분석 수행
-                st.info("🔍 결과물을 분석하고 있습니다...")
-                analysis_result = text_processor.analyze_compliance(requirements, submission_text)
-                
-                # 보고서 생성
-                st.info("📊 보고서를 생성하고 있습니다...")
-                report = text_processor.generate_report(analysis_result)
-                
-                # 결과를 세션 상태에 저장
-                st.session_state.analysis_result = analysis_result
-                st.session_state.report = report
-                st.session_state.requirements = requirements
-                st.session_state.submission_text = submission_text
-                
-                st.success("✅ 분석이 완료되었습니다! '결과 보기' 탭에서 확인하세요.")
-                
-            except Exception as e:
-                st.error(f"분석 중 오류가 발생했습니다: {str(e)}")
+        if req_image:
+            requirements_text = next(extracted_texts)
+            with preview_col1:
+                st.text_area("추출된 텍스트:", requirements_text, height=200, key="req_image_preview")
+        
+        if sub_image:
+            submission_text = next(extracted_texts)
+            with preview_col2:
+                st.text_area("추출된 텍스트:", submission_text, height=200, key="sub_image_preview")
+    
+    if not requirements_text.strip() or not submission_text.strip():
+        st.error("⚠️ 요구조건과 결과물을 모두 입력해주세요.")
+        return
+    
+    # 진행 상황 표시
+    with st.spinner("AI가 분석 중입니다..."):
+        try:
+            # 세션 상태에서 API 키 가져오기
+            current_api_key = st.session_state.get('api_key')
+            if not current_api_key:
+                st.error("⚠️ API 키가 설정되지 않았습니다. 사이드바에서 API 키를 입력해주세요.")
+                return
+            
+            # TextProcessor 초기화 (API 키별로 캐싱된 모델 사용)
+            text_processor = TextProcessor(api_key=current_api_key)
+            
+            # 요구조건 추출
+            st.info("📋 요구조건을 분석하고 있습니다...")
+            requirements = text_processor.extract_requirements(requirements_text)
+            
+            if not requirements:
+                st.error("요구조건을 추출할 수 없습니다. 텍스트를 다시 확인해주세요.")
+                return
+            
+            # 분석 수행
+            st.info("🔍 결과물을 분석하고 있습니다...")
+            analysis_result = text_processor.analyze_compliance(requirements, submission_text)
+            
+            # 보고서 생성
+            st.info("📊 보고서를 생성하고 있습니다...")
+            report = text_processor.generate_report(analysis_result)
+            
+            # 결과를 세션 상태에 저장
+            st.session_state.analysis_result = analysis_result
+            st.session_state.report = report
+            st.session_state.requirements = requirements
+            st.session_state.submission_text = submission_text
+            
+            st.success("✅ 분석이 완료되었습니다! '결과 보기' 탭에서 확인하세요.")
+            
+        except Exception as e:
+            st.error(f"분석 중 오류가 발생했습니다: {str(e)}")
 
 def show_results_tab():
     """결과 탭을 표시합니다."""
@@ -327,7 +384,9 @@ def show_results_tab():
         )
     
     with col3:
-        avg_score = sum(req.get('score', 0) for req in analysis_result.get('requirements_analysis', [])) / max(len(analysis_result.get('requirements_analysis', [])), 1)
+        # 분석에 실패한 항목은 평균에서 제외
+        analyzed = [req for req in analysis_result.get('requirements_analysis', []) if req.get('analyzed', True)]
+        avg_score = sum(req.get('score', 0) for req in analyzed) / max(len(analyzed), 1)
         st.metric(
             label="평균 점수",
             value=f"{avg_score:.1f}/100",
@@ -342,7 +401,10 @@ def show_results_tab():
             col1, col2 = st.columns(2)
             
             with col1:
-                status = "✅ 만족" if analysis.get('satisfied', False) else "❌ 미만족"
+                if not analysis.get('analyzed', True):
+                    status = "⚠️ 분석 실패"
+                else:
+                    status = "✅ 만족" if analysis.get('satisfied', False) else "❌ 미만족"
                 st.write(f"**상태**: {status}")
                 st.write(f"**점수**: {analysis.get('score', 0)}/100")
             
@@ -374,6 +436,7 @@ def show_results_tab():
     st.subheader("📄 전체 보고서")
     st.markdown(report)
 
+@st.fragment
 def show_share_tab():
     """공유 탭을 표시합니다."""
     
@@ -385,21 +448,26 @@ def show_share_tab():
     
     st.subheader("이메일로 보고서 공유")
     
-    # 이메일 입력
-    recipient_email = st.text_input(
-        "수신자 이메일 주소:",
-        placeholder="example@email.com"
-    )
-    
-    # 이메일 제목
-    email_subject = st.text_input(
-        "이메일 제목:",
-        value="수행평가 검사 보고서",
-        placeholder="이메일 제목을 입력하세요"
-    )
+    # 입력 위젯들을 폼으로 묶어 버튼을 누를 때만 다시 실행
+    with st.form("share"):
+        # 이메일 입력
+        recipient_email = st.text_input(
+            "수신자 이메일 주소:",
+            placeholder="example@email.com"
+        )
+        
+        # 이메일 제목
+        email_subject = st.text_input(
+            "이메일 제목:",
+            value="수행평가 검사 보고서",
+            placeholder="이메일 제목을 입력하세요"
+        )
+        
+        preview_clicked = st.form_submit_button("👀 이메일 내용 미리보기")
+        send_clicked = st.form_submit_button("📤 이메일 전송", type="primary")
     
     # 이메일 내용 미리보기
-    if st.checkbox("이메일 내용 미리보기"):
+    if preview_clicked:
         st.subheader("📧 이메일 미리보기")
         st.markdown("**제목:** " + email_subject)
         st.markdown("**수신자:** " + recipient_email)
@@ -407,13 +475,13 @@ def show_share_tab():
         st.markdown(st.session_state.report)
     
     # 이메일 전송
-    if st.button("📤 이메일 전송", type="primary"):
+    if send_clicked:
         if not recipient_email:
             st.error("수신자 이메일 주소를 입력해주세요.")
             return
         
         # 이메일 형식 검증
-        email_sender = EmailSender()
+        email_sender = get_email_sender()
         if not email_sender.validate_email(recipient_email):
             st.error("올바른 이메일 주소 형식이 아닙니다.")
             return
@@ -5,13 +5,19 @@
 
 import smtplib
 import os
+import re
+import threading
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
 from typing import Optional, List
+import markdown
 import streamlit as st
 
+# 이메일 주소 형식 검증용 정규식 (모듈 로드 시 한 번만 컴파일)
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
 class EmailSender:
     """
     이메일 전송을 담당하는 클래스
@@ -28,6 +34,13 @@ class EmailSender:
         self.smtp_server = "smtp.gmail.com"
         self.smtp_port = 587
         
+        # 연결이 응답 없이 끊긴 경우 잠금을 잡은 채 무한정 기다리지 않도록 제한 (초)
+        self.smtp_timeout = 30
+        
+        # 전송 간에 재사용할 SMTP 연결 (여러 세션이 공유하므로 잠금으로 보호)
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._smtp_lock = threading.Lock()
+        
         # 환경 변수에서 이메일 설정 가져오기
         self.sender_email = os.getenv('EMAIL_ADDRESS')
         self.sender_password = os.getenv('EMAIL_PASSWORD')
@@ -55,23 +68,21 @@ class EmailSender:
         
         try:
             # 이메일 메시지 생성
-            message = MIMEMultipart("alternative")
-            message["Subject"] = subject
-            message["From"] = self.sender_email
-            message["To"] = recipient_email
-            
-            # HTML 형식의 이메일 본문 생성
-            html_content = self._create_html_email(report_content)
-            
-            # HTML 부분 추가
-            html_part = MIMEText(html_content, "html", "utf-8")
-            message.attach(html_part)
+            message = self._create_message(recipient_email, report_content, subject)
             
-            # SMTP 서버 연결 및 이메일 전송
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()  # TLS 암호화 시작
-                server.login(self.sender_email, self.sender_password)
-                server.send_message(message)
+            # SMTP 서버 연결(기존 연결 재사용) 및 이메일 전송
+            with self._smtp_lock:
+                try:
+                    try:
+                        self._get_connection().send_message(message)
+                    except smtplib.SMTPServerDisconnected:
+                        # NOOP 확인 직후 서버가 연결을 끊은 경우 새 연결로 한 번만 다시 시도
+                        self._close_connection()
+                        self._get_connection().send_message(message)
+                except Exception:
+                    # 문제가 생긴 연결은 버리고 다음 전송 때 다시 연결
+                    self._close_connection()
+                    raise
             
             return True
             
@@ -79,6 +90,76 @@ class EmailSender:
             print(f"이메일 전송 중 오류 발생: {e}")
             return False
     
+    def _create_message(self, recipient_email: str, report_content: str,
+                        subject: str) -> MIMEMultipart:
+        """
+        전송할 이메일 메시지를 생성합니다.
+        
+        Args:
+            recipient_email (str): 수신자 이메일 주소
+            report_content (str): 전송할 보고서 내용
+            subject (str): 이메일 제목
+            
+        Returns:
+            MIMEMultipart: 이메일 메시지
+        """
+        message = MIMEMultipart("alternative")
+        message["Subject"] = subject
+        message["From"] = self.sender_email
+        message["To"] = recipient_email
+        
+        # HTML 형식의 이메일 본문 생성
+        html_content = self._create_html_email(report_content)
+        
+        # HTML 부분 추가
+        html_part = MIMEText(html_content, "html", "utf-8")
+        message.attach(html_part)
+        
+        return message
+    
+    def _get_connection(self) -> smtplib.SMTP:
+        """
+        로그인된 SMTP 연결을 반환합니다.
+        
+        TLS 핸드셰이크와 로그인 비용을 줄이기 위해 연결을 유지하며,
+        기존 연결이 끊어진 경우에만 새로 연결합니다.
+        호출하는 쪽에서 self._smtp_lock을 잡고 있어야 합니다.
+        
+        Returns:
+            smtplib.SMTP: 로그인된 SMTP 연결
+        """
+        if self._smtp is not None:
+            try:
+                status, _ = self._smtp.noop()
+                if status == 250:
+                    return self._smtp
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._close_connection()
+        
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.smtp_timeout)
+        try:
+            server.starttls()  # TLS 암호화 시작
+            server.login(self.sender_email, self.sender_password)
+        except Exception:
+            server.close()
+            raise
+        
+        self._smtp = server
+        return server
+    
+    def _close_connection(self):
+        """유지 중인 SMTP 연결을 닫습니다."""
+        if self._smtp is None:
+            return
+        
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self._smtp.close()
+        finally:
+            self._smtp = None
+    
     def _create_html_email(self, report_content: str) -> str:
         """
         보고서 내용을 HTML 형식의 이메일로 변환합니다.
@@ -89,19 +170,8 @@ class EmailSender:
         Returns:
             str: HTML 형식의 이메일 내용
         """
-        # 간단한 마크다운을 HTML로 변환
-        html_content = report_content
-        
-        # 제목 변환
-        html_content = html_content.replace("# ", "<h1>").replace("\n", "</h1>\n")
-        html_content = html_content.replace("## ", "<h2>").replace("\n", "</h2>\n")
-        html_content = html_content.replace("### ", "<h3>").replace("\n", "</h3>\n")
-        
-        # 굵은 글씨 변환
-        html_content = html_content.replace("**", "<strong>").replace("**", "</strong>")
-        
-        # 줄바꿈 변환
-        html_content = html_content.replace("\n", "<br>\n")
+        # 마크다운을 HTML로 변환 (제목, 목록, 굵은 글씨 등)
+        html_content = markdown.markdown(report_content, extensions=['extra'])
         
         # HTML 템플릿 적용
         html_template = f"""
@@ -144,7 +214,6 @@ class EmailSender:
             </style>
         </head>
         <body>
-            <h1>📋 수행평가 검사 보고서</h1>
             {html_content}
             <hr>
             <p style="color: #7f8c8d; font-size: 12px;">
@@ -166,11 +235,8 @@ class EmailSender:
         Returns:
             bool: 유효한 이메일 주소 여부
         """
-        import re
-        
         # 간단한 이메일 형식 검증
-        pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        return re.match(pattern, email) is not None
+        return _EMAIL_RE.match(email) is not None
     
     def get_setup_instructions(self) -> str:
         """
@@ -191,3 +257,14 @@ class EmailSender:
         
         또는 Streamlit의 secrets.toml 파일에 추가할 수도 있습니다.
         """
+
+
+@st.cache_resource(show_spinner=False)
+def get_email_sender() -> EmailSender:
+    """
+    앱 전체에서 공유하는 EmailSender 객체를 반환합니다.
+    
+    Returns:
+        EmailSender: 캐싱된 EmailSender 객체
+    """
+    return EmailSender()
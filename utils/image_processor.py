@@ -4,10 +4,52 @@
 """
 
 import os
-from typing import Optional
-from PIL import Image
-import pytesseract
+import asyncio
+import hashlib
+import threading
+from typing import TYPE_CHECKING, List, Optional
 import io
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+# PIL, pytesseract, OpenCV, NumPy는 무거우므로 실제로 OCR을 수행할 때 임포트합니다
+if TYPE_CHECKING:
+    import numpy as np
+    from PIL import Image
+
+
+def _content_hash(data: bytes) -> str:
+    """이미지 바이트의 내용 해시를 반환합니다. (OCR 캐시 키 용도)"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _ocr_bytes(content_hash: str, _data: bytes, lang: str, psm: int = 3) -> str:
+    """
+    이미지 바이트에서 텍스트를 추출합니다. (결과 캐싱)
+    
+    Streamlit은 위젯을 조작할 때마다 스크립트를 다시 실행하므로,
+    같은 이미지에 대해 OCR이 반복되지 않도록 이미지 내용의 해시를 키로 캐싱합니다.
+    같은 파일을 다시 업로드해도 내용이 같으면 캐시된 결과를 사용합니다.
+    이미지 바이트는 캐시 키에서 제외하고(밑줄 인자) 미리 계산한 해시만 키로 사용합니다.
+    
+    Args:
+        content_hash (str): 이미지 내용의 해시 (캐시 키 용도)
+        _data (bytes): 이미지 파일의 바이트
+        lang (str): Tesseract 언어 설정
+        psm (int): Tesseract 페이지 분할 모드 (6: 단일 텍스트 블록, 3: 자동 레이아웃 분석)
+        
+    Returns:
+        str: 정리된 텍스트
+    """
+    from PIL import Image
+    import pytesseract
+    
+    image = Image.open(io.BytesIO(_data))
+    processed_image = ImageProcessor._preprocess_image(image)
+    text = pytesseract.image_to_string(processed_image, lang=lang, config=f'--oem 1 --psm {psm}')
+    return ImageProcessor._clean_text(text)
+
 
 class ImageProcessor:
     """
@@ -26,6 +68,7 @@ class ImageProcessor:
         
         # Tesseract가 설치되어 있는지 확인
         try:
+            import pytesseract
             pytesseract.get_tesseract_version()
         except Exception as e:
             print(f"Tesseract OCR이 설치되지 않았습니다: {e}")
@@ -34,70 +77,137 @@ class ImageProcessor:
             print("Mac: brew install tesseract")
             print("Linux: sudo apt-get install tesseract-ocr")
     
-    def extract_text_from_image(self, image_file) -> str:
+    def extract_text_from_image(self, image_file, lang: str = 'kor+eng', psm: int = 3) -> str:
         """
         업로드된 이미지 파일에서 텍스트를 추출합니다.
         
+        기본값은 자동 레이아웃 분석(PSM 3)이며, 레이아웃 분석이 필요 없는
+        짧은 요구조건 문단은 psm=6(단일 텍스트 블록)으로 더 빠르게 처리할 수 있습니다.
+        한 가지 언어만 지정하면(예: 'kor') 언어 모델을 하나만 사용하므로 더 빠릅니다.
+        
         Args:
             image_file: Streamlit에서 업로드된 파일 객체
+            lang (str): Tesseract 언어 설정 ('kor', 'eng', 'kor+eng')
+            psm (int): Tesseract 페이지 분할 모드
             
         Returns:
             str: 추출된 텍스트
         """
         try:
-            # 이미지 파일을 PIL Image 객체로 변환
-            image = Image.open(image_file)
-            
-            # 이미지 전처리 (선택사항)
-            # 이미지 품질이 좋지 않은 경우 전처리가 도움될 수 있습니다
-            processed_image = self._preprocess_image(image)
-            
-            # OCR을 사용하여 텍스트 추출
-            text = pytesseract.image_to_string(processed_image, lang='kor+eng')
-            
-            # 텍스트 정리
-            cleaned_text = self._clean_text(text)
-            
-            return cleaned_text
+            # 업로드된 파일 내용의 해시를 키로 캐싱된 OCR 수행
+            data = image_file.getvalue()
+            return _ocr_bytes(_content_hash(data), data, lang, psm)
             
         except Exception as e:
             print(f"이미지에서 텍스트 추출 중 오류 발생: {e}")
             return f"이미지 처리 중 오류가 발생했습니다: {str(e)}"
     
-    def _preprocess_image(self, image: Image.Image) -> Image.Image:
+    async def extract_text_from_image_async(self, image_file, lang: str = 'kor+eng',
+                                            psm: int = 3) -> str:
+        """
+        extract_text_from_image를 별도 스레드에서 실행합니다.
+        
+        Tesseract는 외부 프로세스로 실행되므로 여러 이미지를 동시에 처리할 수 있습니다.
+        작업 스레드에는 현재 스크립트의 실행 컨텍스트를 연결해서 캐시 함수를 호출합니다.
+        
+        Args:
+            image_file: Streamlit에서 업로드된 파일 객체
+            lang (str): Tesseract 언어 설정
+            psm (int): Tesseract 페이지 분할 모드
+            
+        Returns:
+            str: 추출된 텍스트
+        """
+        loop = asyncio.get_running_loop()
+        ctx = get_script_run_ctx()
+        
+        def _extract() -> str:
+            # 캐시 함수가 "missing ScriptRunContext" 경고 없이 동작하도록 컨텍스트 연결
+            add_script_run_ctx(threading.current_thread(), ctx)
+            return self.extract_text_from_image(image_file, lang, psm)
+        
+        return await loop.run_in_executor(None, _extract)
+    
+    def extract_texts_from_images(self, *image_files, lang: str = 'kor+eng',
+                                  psm: int = 3, psms: Optional[List[int]] = None) -> List[str]:
+        """
+        여러 이미지에서 동시에 텍스트를 추출합니다.
+        
+        Args:
+            *image_files: Streamlit에서 업로드된 파일 객체들
+            lang (str): Tesseract 언어 설정
+            psm (int): Tesseract 페이지 분할 모드 (psms가 없을 때 모든 이미지에 적용)
+            psms (Optional[List[int]]): 이미지별 페이지 분할 모드 (image_files와 같은 순서)
+            
+        Returns:
+            List[str]: 입력 순서대로 추출된 텍스트 리스트
+        """
+        if psms is None:
+            psms = [psm] * len(image_files)
+        
+        async def _extract_all():
+            return await asyncio.gather(
+                *(self.extract_text_from_image_async(image_file, lang, image_psm)
+                  for image_file, image_psm in zip(image_files, psms))
+            )
+        
+        return list(asyncio.run(_extract_all()))
+    
+    @staticmethod
+    def _preprocess_image(image: "Image.Image") -> "np.ndarray":
         """
         OCR 성능 향상을 위한 이미지 전처리
         
+        OpenCV로 흑백 변환, 크기 조정, 적응형 이진화를 수행합니다.
+        
         Args:
             image (Image.Image): 원본 이미지
             
         Returns:
-            Image.Image: 전처리된 이미지
+            np.ndarray: 전처리된 흑백 이미지 배열
         """
+        import cv2
+        import numpy as np
+        
+        # 큰 JPEG은 디코딩 단계에서 바로 축소해서 읽기 (다른 형식은 영향 없음)
+        # draft는 요청 크기보다 작아지지 않는 범위에서 1/2, 1/4, 1/8로 축소하므로
+        # 아래 크기 조정과 같은 비율로 맞춘 목표 크기를 전달
+        width, height = image.size
+        if width > 2000 or height > 2000:
+            ratio = min(2000/width, 2000/height)
+            image.draft('RGB', (int(width * ratio), int(height * ratio)))
+        
         # 이미지를 RGB 모드로 변환 (필요한 경우)
         if image.mode != 'RGB':
             image = image.convert('RGB')
         
+        # 흑백 이미지로 변환
+        gray = cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2GRAY)
+        
         # 이미지 크기 조정 (너무 크거나 작은 경우)
-        width, height = image.size
+        height, width = gray.shape
         
         # 너무 큰 이미지는 축소
         if width > 2000 or height > 2000:
             ratio = min(2000/width, 2000/height)
             new_width = int(width * ratio)
             new_height = int(height * ratio)
-            image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+            gray = cv2.resize(gray, (new_width, new_height), interpolation=cv2.INTER_AREA)
         
         # 너무 작은 이미지는 확대
         elif width < 300 or height < 300:
             ratio = max(300/width, 300/height)
             new_width = int(width * ratio)
             new_height = int(height * ratio)
-            image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+            gray = cv2.resize(gray, (new_width, new_height), interpolation=cv2.INTER_CUBIC)
         
-        return image
+        # 조명이 고르지 않은 사진도 글자가 잘 보이도록 적응형 이진화
+        return cv2.adaptiveThreshold(
+            gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 15
+        )
     
-    def _clean_text(self, text: str) -> str:
+    @staticmethod
+    def _clean_text(text: str) -> str:
         """
         추출된 텍스트를 정리합니다.
         
@@ -4,9 +4,319 @@
 """
 
 import os
-from typing import Dict, List, Tuple
-import google.generativeai as genai
+from typing import Dict, List, Optional, Tuple
 import json
+import re
+import threading
+import streamlit as st
+
+# 목록 기호(-, *, •)나 번호(1., 2., ...)로 시작하는 줄머리를 제거하는 정규식
+# 기호 뒤에 공백이 있어야 하고 번호는 세 자리까지만 인정하므로
+# "2024. 3. 1" 같은 날짜나 "-5도" 같은 음수는 그대로 유지
+_BULLET_RE = re.compile(r'^(?:[-*•]\s+|\d{1,3}\.\s+)+')
+
+# 이보다 짧은 제출물은 AI 분석 없이 바로 미충족 결과를 반환
+MIN_SUBMISSION_LENGTH = 20
+
+# JSON 파싱 실패 시 요구조건을 절반으로 나누어 재시도하는 최대 횟수
+# (1이면 최대 3번 호출: 전체 1번 + 절반씩 2번)
+MAX_SPLIT_DEPTH = 1
+
+# 마크다운 코드 블록(```json ... ```) 안의 내용을 찾는 정규식
+_JSON_FENCE_RE = re.compile(r'```(?:json)?\s*(.*?)```', re.S)
+
+# genai.configure는 전역 설정을 바꾸므로 모델 생성과 클라이언트 연결을 한 번에 하나씩만 수행
+_MODEL_LOCK = threading.Lock()
+
+
+@st.cache_resource(show_spinner=False)
+def get_model(api_key: str):
+    """
+    Gemini 모델 객체를 생성합니다. (API 키별로 한 번만 생성)
+    
+    GenerativeModel은 첫 generate_content 호출 때 그 시점의 전역 설정으로 클라이언트를 만들기 때문에,
+    다른 세션이 다른 API 키로 configure를 호출하면 잘못된 키가 연결될 수 있습니다.
+    그래서 해당 키로 설정된 상태에서 바로 클라이언트를 연결해 둡니다.
+    
+    Args:
+        api_key (str): Google API 키
+        
+    Returns:
+        genai.GenerativeModel: Gemini 모델 객체
+    """
+    # google.generativeai는 임포트 비용이 크므로 모델이 처음 필요할 때 임포트
+    import google.generativeai as genai
+    from google.generativeai import client as genai_client
+    
+    with _MODEL_LOCK:
+        genai.configure(api_key=api_key)
+        model = genai.GenerativeModel('gemini-2.0-flash-exp')
+        model._client = genai_client.get_default_generative_client()
+    return model
+
+
+class _UnparsableResponse(ValueError):
+    """AI 응답을 기대한 형태의 JSON으로 해석할 수 없을 때 발생하는 예외"""
+    
+    def __init__(self, response_text: str):
+        super().__init__("AI 응답을 JSON으로 해석할 수 없습니다.")
+        self.response_text = response_text
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _gemini_json(_model, api_key: str, prompt: str, expected: str):
+    """
+    Gemini 모델에 프롬프트를 보내고 응답을 JSON으로 파싱해서 반환합니다. (결과 캐싱)
+    
+    Streamlit은 위젯을 조작할 때마다 스크립트를 다시 실행하므로,
+    입력이 같으면 LLM을 다시 호출하지 않도록 (API 키, 프롬프트)를 키로 캐싱합니다.
+    모델 객체는 해시하지 않습니다. (밑줄로 시작하는 인자는 캐시 키에서 제외됨)
+    파싱에 실패하면 예외를 발생시키므로 잘못된 응답은 캐싱되지 않고 다음 실행 때 다시 요청합니다.
+    
+    Args:
+        _model: Gemini 모델 객체
+        api_key (str): 모델에 사용된 Google API 키 (캐시 키 용도)
+        prompt (str): 전송할 프롬프트
+        expected (str): 기대하는 JSON 형태 ('list' 또는 'dict')
+        
+    Returns:
+        파싱된 JSON 값 (expected에 해당하는 list 또는 dict)
+        
+    Raises:
+        _UnparsableResponse: 응답을 기대한 형태의 JSON으로 해석할 수 없는 경우
+    """
+    response_text = _model.generate_content(prompt).text
+    
+    try:
+        value = _extract_json(response_text)
+    except json.JSONDecodeError:
+        raise _UnparsableResponse(response_text) from None
+    
+    if not isinstance(value, {'list': list, 'dict': dict}[expected]):
+        raise _UnparsableResponse(response_text)
+    return value
+
+
+def _extract_json(text: str):
+    """
+    AI 응답에서 JSON 값을 추출합니다.
+    
+    응답이 코드 블록으로 감싸져 있거나 앞뒤에 설명 문장이 붙어 있어도
+    첫 번째 JSON 객체/배열만 잘라서 파싱합니다.
+    
+    Args:
+        text (str): AI 응답 텍스트
+        
+    Returns:
+        파싱된 JSON 값 (dict 또는 list)
+        
+    Raises:
+        json.JSONDecodeError: JSON 값을 찾을 수 없는 경우
+    """
+    # 응답 전체가 JSON인 경우 (가장 흔한 경우)
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    
+    # 코드 블록으로 감싸진 경우 블록 안쪽만 사용
+    fence = _JSON_FENCE_RE.search(text)
+    if fence:
+        text = fence.group(1)
+    
+    # 첫 번째 { 또는 [ 부터 괄호가 맞는 부분까지만 파싱 (뒤에 붙은 설명은 무시)
+    decoder = json.JSONDecoder()
+    starts = sorted(index for index in (text.find('{'), text.find('[')) if index != -1)
+    for start in starts:
+        try:
+            value, _ = decoder.raw_decode(text, start)
+            return value
+        except json.JSONDecodeError:
+            continue
+    
+    raise json.JSONDecodeError("JSON 값을 찾을 수 없습니다.", text, 0)
+
+
+def _build_requirements_prompt(text: str) -> str:
+    """요구조건 추출용 프롬프트를 생성합니다."""
+    return f"""
+        다음 텍스트에서 수행평가의 요구조건을 추출해주세요.
+        각 요구조건을 별도의 항목으로 나누어 리스트 형태로 반환해주세요.
+        
+        텍스트:
+        {text}
+        
+        요구조건을 JSON 배열 형태로 반환해주세요:
+        """
+
+
+def _build_compliance_prompt(requirements: List[str], submission: str) -> str:
+    """요구조건 충족도 분석용 프롬프트를 생성합니다."""
+    requirements_text = "\n".join([f"{i+1}. {req}" for i, req in enumerate(requirements)])
+    
+    return f"""
+        다음 수행평가 요구조건과 제출물을 분석해주세요.
+        
+        요구조건:
+        {requirements_text}
+        
+        제출물:
+        {submission}
+        
+        다음 JSON 형태로 분석 결과를 반환해주세요:
+        {{
+            "overall_score": 0-100,
+            "requirements_analysis": [
+                {{
+                    "requirement": "요구조건 내용",
+                    "satisfied": true/false,
+                    "score": 0-100,
+                    "feedback": "구체적인 피드백",
+                    "suggestions": ["개선 제안1", "개선 제안2"]
+                }}
+            ],
+            "general_feedback": "전체적인 피드백",
+            "improvement_suggestions": ["전체 개선 제안1", "전체 개선 제안2"]
+        }}
+        """
+
+
+def _default_analysis(requirements: List[str]) -> Dict:
+    """
+    AI 응답을 해석할 수 없을 때 사용할 기본 분석 결과를 생성합니다.
+    
+    각 항목은 "analyzed": False로 표시해서 실제 분석 결과와 구분하고,
+    전체 점수를 합칠 때 제외되도록 합니다.
+    """
+    return {
+        "overall_score": 0,
+        "requirements_analysis": [
+            {
+                "requirement": req,
+                "satisfied": False,
+                "analyzed": False,
+                "score": 0,
+                "feedback": "분석 실패: AI 응답을 해석할 수 없어 이 요구조건은 분석되지 않았습니다.",
+                "suggestions": ["잠시 후 다시 검사해주세요."]
+            } for req in requirements
+        ],
+        "general_feedback": "AI 응답을 해석할 수 없어 일부 요구조건을 분석하지 못했습니다.",
+        "improvement_suggestions": []
+    }
+
+
+def _insufficient_input_analysis(requirements: List[str]) -> Dict:
+    """요구조건이 없거나 제출물이 너무 짧을 때 사용할 분석 결과를 생성합니다."""
+    return {
+        "overall_score": 0,
+        "requirements_analysis": [
+            {
+                "requirement": req,
+                "satisfied": False,
+                "score": 0,
+                "feedback": "제출물 내용이 너무 짧아 분석할 수 없습니다.",
+                "suggestions": ["요구조건에 맞는 내용을 충분히 작성해주세요."]
+            } for req in requirements
+        ],
+        "general_feedback": "요구조건이 없거나 제출물 내용이 너무 짧아 AI 분석을 진행하지 않았습니다.",
+        "improvement_suggestions": ["요구조건과 결과물을 다시 확인한 뒤 검사해주세요."]
+    }
+
+
+def _to_score(value) -> float:
+    """AI가 돌려준 점수를 숫자로 변환합니다. (문자열 "85" 등 허용, 변환 불가 시 0)"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _analyzed_count(result: Dict) -> int:
+    """분석 결과에서 실제로 분석된 항목 수를 반환합니다. (항목 목록이 비어 있으면 1로 간주)"""
+    rows = result.get('requirements_analysis', [])
+    if not rows:
+        return 1
+    return sum(1 for row in rows if row.get('analyzed', True))
+
+
+def _merge_analysis_results(results: List[Dict]) -> Dict:
+    """
+    요구조건 묶음별 분석 결과를 하나로 합칩니다.
+    
+    전체 점수는 각 묶음에서 실제로 분석된 항목 수로 가중 평균하고
+    (분석 실패 항목만 있는 묶음은 제외), 피드백과 개선 제안은 순서를 유지하며 이어 붙입니다.
+    """
+    if len(results) == 1:
+        return results[0]
+    
+    weights = [_analyzed_count(result) for result in results]
+    overall_score = sum(
+        _to_score(result.get('overall_score')) * weight for result, weight in zip(results, weights)
+    ) / sum(weights) if sum(weights) else 0
+    
+    return {
+        "overall_score": round(overall_score),
+        "requirements_analysis": [
+            analysis for result in results for analysis in result.get('requirements_analysis', [])
+        ],
+        "general_feedback": "\n".join(
+            dict.fromkeys(str(result['general_feedback']) for result in results if result.get('general_feedback'))
+        ),
+        # AI가 제안을 객체로 돌려줄 수도 있으므로 문자열로 바꾼 뒤 중복 제거 (dict/list는 해시 불가)
+        "improvement_suggestions": list(dict.fromkeys(
+            str(suggestion) for result in results for suggestion in result.get('improvement_suggestions', [])
+        ))
+    }
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _generate_report(analysis_json: str) -> str:
+    """
+    분석 결과(JSON 문자열)로 검사 보고서를 생성합니다. (결과 캐싱)
+    
+    Args:
+        analysis_json (str): json.dumps(..., sort_keys=True)로 직렬화한 분석 결과
+        
+    Returns:
+        str: 생성된 보고서 텍스트
+    """
+    analysis_result = json.loads(analysis_json)
+    
+    # 문자열을 반복해서 이어 붙이지 않고 조각을 모아 한 번에 결합
+    parts = [f"""
+# 수행평가 검사 보고서
+
+## 📊 전체 만족도: {analysis_result.get('overall_score', 0)}/100
+
+## 📋 항목별 분석 결과
+"""]
+    
+    for i, analysis in enumerate(analysis_result.get('requirements_analysis', []), 1):
+        if not analysis.get('analyzed', True):
+            status = "⚠️ 분석 실패"
+        else:
+            status = "✅ 만족" if analysis.get('satisfied', False) else "❌ 미만족"
+        parts.append(f"""
+### {i}. {analysis.get('requirement', 'N/A')}
+- **상태**: {status}
+- **점수**: {analysis.get('score', 0)}/100
+- **피드백**: {analysis.get('feedback', 'N/A')}
+- **개선 제안**:
+""")
+        # 하위 목록은 4칸 들여쓰기 (Python-Markdown은 4칸이어야 중첩 목록으로 인식)
+        parts.extend(f"    - {suggestion}\n" for suggestion in analysis.get('suggestions', []))
+    
+    parts.append(f"""
+## 💡 전체 피드백
+{analysis_result.get('general_feedback', 'N/A')}
+
+## 🔧 개선 제안
+""")
+    
+    parts.extend(f"- {suggestion}\n" for suggestion in analysis_result.get('improvement_suggestions', []))
+    
+    return "".join(parts)
+
 
 class TextProcessor:
     """
@@ -18,8 +328,14 @@ class TextProcessor:
     3. 개선점 제안 생성
     """
     
-    def __init__(self, api_key=None):
-        """TextProcessor 클래스 초기화"""
+    def __init__(self, api_key=None, model=None):
+        """
+        TextProcessor 클래스 초기화
+        
+        Args:
+            api_key (str): Google API 키 (없으면 환경 변수 사용)
+            model: 사용할 Gemini 모델 객체 (없으면 get_model로 가져옴)
+        """
         # Google API 키 확인
         if api_key is None:
             api_key = os.getenv('GOOGLE_API_KEY')
@@ -27,9 +343,12 @@ class TextProcessor:
         if not api_key:
             raise ValueError("GOOGLE_API_KEY가 설정되지 않았습니다.")
         
-        # Google Generative AI 설정
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-2.0-flash-exp')
+        self.api_key = api_key
+        
+        # Google Generative AI 모델 (캐싱된 리소스 재사용)
+        if model is None:
+            model = get_model(api_key)
+        self.model = model
     
     def extract_requirements(self, text: str) -> List[str]:
         """
@@ -41,30 +360,18 @@ class TextProcessor:
         Returns:
             List[str]: 추출된 요구조건 리스트
         """
-        prompt = f"""
-        다음 텍스트에서 수행평가의 요구조건을 추출해주세요.
-        각 요구조건을 별도의 항목으로 나누어 리스트 형태로 반환해주세요.
-        
-        텍스트:
-        {text}
-        
-        요구조건을 JSON 배열 형태로 반환해주세요:
-        """
+        prompt = _build_requirements_prompt(text)
         
         try:
-            response = self.model.generate_content(prompt)
-            # JSON 형태로 파싱 시도
+            # JSON 배열로 파싱 시도
             try:
-                requirements = json.loads(response.text)
-                if isinstance(requirements, list):
-                    return requirements
-            except json.JSONDecodeError:
-                pass
+                return _gemini_json(self.model, self.api_key, prompt, 'list')
+            except _UnparsableResponse as e:
+                response_text = e.response_text
             
             # JSON 파싱이 실패하면 줄바꿈으로 분리
-            lines = response.text.strip().split('\n')
-            requirements = [line.strip().lstrip('- ').lstrip('* ').lstrip('1. ').lstrip('2. ').lstrip('3. ') 
-                          for line in lines if line.strip()]
+            lines = response_text.strip().split('\n')
+            requirements = [_BULLET_RE.sub('', line.strip()) for line in lines if line.strip()]
             return [req for req in requirements if req]
             
         except Exception as e:
@@ -82,58 +389,13 @@ class TextProcessor:
         Returns:
             Dict: 분석 결과 (만족도, 개선점 등)
         """
-        requirements_text = "\n".join([f"{i+1}. {req}" for i, req in enumerate(requirements)])
-        
-        prompt = f"""
-        다음 수행평가 요구조건과 제출물을 분석해주세요.
-        
-        요구조건:
-        {requirements_text}
-        
-        제출물:
-        {submission}
-        
-        다음 JSON 형태로 분석 결과를 반환해주세요:
-        {{
-            "overall_score": 0-100,
-            "requirements_analysis": [
-                {{
-                    "requirement": "요구조건 내용",
-                    "satisfied": true/false,
-                    "score": 0-100,
-                    "feedback": "구체적인 피드백",
-                    "suggestions": ["개선 제안1", "개선 제안2"]
-                }}
-            ],
-            "general_feedback": "전체적인 피드백",
-            "improvement_suggestions": ["전체 개선 제안1", "전체 개선 제안2"]
-        }}
-        """
+        # 요구조건이 없거나 제출물이 너무 짧으면 AI를 호출하지 않고 바로 결과 반환
+        if not requirements or len(submission.strip()) < MIN_SUBMISSION_LENGTH:
+            return _insufficient_input_analysis(requirements)
         
         try:
-            response = self.model.generate_content(prompt)
+            return self.analyze_compliance_batched(requirements, submission)
             
-            # JSON 파싱 시도
-            try:
-                result = json.loads(response.text)
-                return result
-            except json.JSONDecodeError:
-                # JSON 파싱 실패 시 기본 구조 반환
-                return {
-                    "overall_score": 70,
-                    "requirements_analysis": [
-                        {
-                            "requirement": req,
-                            "satisfied": True,
-                            "score": 70,
-                            "feedback": "기본적인 요구사항 충족",
-                            "suggestions": ["더 구체적인 내용 추가 필요"]
-                        } for req in requirements
-                    ],
-                    "general_feedback": "전반적으로 요구사항을 충족하지만 개선의 여지가 있습니다.",
-                    "improvement_suggestions": ["더 구체적인 예시 추가", "논리적 구조 개선"]
-                }
-                
         except Exception as e:
             print(f"분석 중 오류 발생: {e}")
             return {
@@ -143,44 +405,71 @@ class TextProcessor:
                 "improvement_suggestions": []
             }
     
-    def generate_report(self, analysis_result: Dict) -> str:
+    def analyze_compliance_batched(self, requirements: List[str], submission: str,
+                                   batch_size: Optional[int] = None) -> Dict:
         """
-        분석 결과를 바탕으로 검사 보고서를 생성합니다.
+        여러 요구조건을 하나의 프롬프트로 묶어 분석합니다.
+        
+        요구조건마다 따로 호출하지 않고 한 번의 호출로 모든 항목을 분석합니다.
+        응답을 JSON으로 해석할 수 없으면 요구조건을 절반씩 나누어 한 번 더 분석합니다.
         
         Args:
-            analysis_result (Dict): analyze_compliance의 결과
+            requirements (List[str]): 요구조건 리스트
+            submission (str): 제출된 수행평가 결과물
+            batch_size (Optional[int]): 한 번의 호출에 포함할 최대 요구조건 수 (None이면 전체)
             
         Returns:
-            str: 생성된 보고서 텍스트
+            Dict: 분석 결과 (만족도, 개선점 등)
         """
-        report = f"""
-# 수행평가 검사 보고서
-
-## 📊 전체 만족도: {analysis_result.get('overall_score', 0)}/100
-
-## 📋 항목별 분석 결과
-"""
+        if not batch_size:
+            batch_size = max(len(requirements), 1)
         
-        for i, analysis in enumerate(analysis_result.get('requirements_analysis', []), 1):
-            status = "✅ 만족" if analysis.get('satisfied', False) else "❌ 미만족"
-            report += f"""
-### {i}. {analysis.get('requirement', 'N/A')}
-- **상태**: {status}
-- **점수**: {analysis.get('score', 0)}/100
-- **피드백**: {analysis.get('feedback', 'N/A')}
-- **개선 제안**:
-"""
-            for suggestion in analysis.get('suggestions', []):
-                report += f"  - {suggestion}\n"
+        batches = [requirements[i:i + batch_size] for i in range(0, len(requirements), batch_size)]
+        results = [self._analyze_batch(batch, submission) for batch in batches or [requirements]]
+        return _merge_analysis_results(results)
+    
+    def _analyze_batch(self, requirements: List[str], submission: str, depth: int = 0) -> Dict:
+        """
+        요구조건 묶음 하나를 분석합니다.
         
-        report += f"""
-## 💡 전체 피드백
-{analysis_result.get('general_feedback', 'N/A')}
-
-## 🔧 개선 제안
-"""
+        JSON 파싱에 실패하면 MAX_SPLIT_DEPTH 단계까지만 절반으로 나누어 재귀 호출하고,
+        그래도 실패하면 기본 분석 결과를 반환합니다.
+        
+        Args:
+            requirements (List[str]): 요구조건 리스트
+            submission (str): 제출된 수행평가 결과물
+            depth (int): 현재 분할 단계
+            
+        Returns:
+            Dict: 분석 결과
+        """
+        prompt = _build_compliance_prompt(requirements, submission)
         
-        for suggestion in analysis_result.get('improvement_suggestions', []):
-            report += f"- {suggestion}\n"
+        # JSON 파싱 시도
+        try:
+            return _gemini_json(self.model, self.api_key, prompt, 'dict')
+        except _UnparsableResponse:
+            pass
+        
+        # 항목이 여러 개면 절반씩 나누어 다시 분석 (호출 횟수가 늘지 않도록 단계 제한)
+        if len(requirements) > 1 and depth < MAX_SPLIT_DEPTH:
+            middle = len(requirements) // 2
+            return _merge_analysis_results([
+                self._analyze_batch(requirements[:middle], submission, depth + 1),
+                self._analyze_batch(requirements[middle:], submission, depth + 1)
+            ])
+        
+        # JSON 파싱 실패 시 기본 구조 반환
+        return _default_analysis(requirements)
+    
+    def generate_report(self, analysis_result: Dict) -> str:
+        """
+        분석 결과를 바탕으로 검사 보고서를 생성합니다.
         
-        return report
+        Args:
+            analysis_result (Dict): analyze_compliance의 결과
+            
+        Returns:
+            str: 생성된 보고서 텍스트
+        """
+        return _generate_report(json.dumps(analysis_result, sort_keys=True, ensure_ascii=False))